@@ -6,6 +6,10 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from hamt import HAMT
 
 
+class SubHAMT(HAMT):
+    __slots__ = ()
+
+
 class TestHAMT(unittest.TestCase):
     
     def test_empty_hamt(self):
@@ -16,6 +20,44 @@ class TestHAMT(unittest.TestCase):
         with self.assertRaises(KeyError):
             h['key']
     
+    def test_empty_hamt_is_shared(self):
+        h = HAMT().set('key', 'value')
+        
+        self.assertIs(HAMT(), HAMT())
+        self.assertIs(HAMT({}), HAMT())
+        self.assertIs(h.delete('key'), HAMT())
+        self.assertEqual(len(h), 1)
+        self.assertEqual(len(HAMT()), 0)
+    
+    def test_copy_and_pickle_round_trip(self):
+        import copy
+        import pickle
+        
+        h = HAMT({'a': 1, 'b': [2]})
+        copied = copy.copy(h)
+        deep = copy.deepcopy(h)
+        unpickled = pickle.loads(pickle.dumps(h))
+        
+        for other in (copied, deep, unpickled):
+            self.assertEqual(other, h)
+            self.assertIsNot(other, HAMT())
+        self.assertIsNot(copied, unpickled)
+        self.assertIsNot(deep['b'], h['b'])
+        self.assertIs(copy.copy(HAMT()), HAMT())
+        self.assertIs(pickle.loads(pickle.dumps(HAMT())), HAMT())
+        
+        sub = SubHAMT({'a': 1})
+        for other in (copy.copy(sub), copy.deepcopy(sub), pickle.loads(pickle.dumps(sub))):
+            self.assertIs(type(other), SubHAMT)
+            self.assertEqual(other, sub)
+    
+    def test_set_same_value_returns_self(self):
+        value = object()
+        h = HAMT().set('key', value)
+        
+        self.assertIs(h.set('key', value), h)
+        self.assertIsNot(h.set('key', object()), h)
+    
     def test_single_item(self):
         h = HAMT()
         h2 = h.set('key', 'value')
@@ -164,6 +206,32 @@ class TestHAMT(unittest.TestCase):
         self.assertEqual(h['b'], 2)
         self.assertEqual(h['c'], 3)
     
+    def test_init_with_duplicate_keys(self):
+        h = HAMT([('a', 1), ('b', 2), ('a', 3)])
+        
+        self.assertEqual(len(h), 2)
+        self.assertEqual(h['a'], 3)
+        self.assertEqual(h['b'], 2)
+    
+    def test_init_matches_incremental_set(self):
+        n = 5000
+        built = HAMT((i, i * 2) for i in range(n))
+        incremental = HAMT()
+        for i in range(n):
+            incremental = incremental.set(i, i * 2)
+        
+        self.assertEqual(len(built), n)
+        self.assertEqual(built, incremental)
+        self.assertEqual(built.set(n, 0)[n], 0)
+        self.assertEqual(len(built.delete(0)), n - 1)
+    
+    def test_init_with_empty_iterator(self):
+        h = HAMT(iter([]))
+        
+        self.assertEqual(len(h), 0)
+        self.assertEqual(list(h), [])
+        self.assertEqual(h.set('a', 1)['a'], 1)
+    
     def test_get_with_default(self):
         h = HAMT()
         h = h.set('key', 'value')
@@ -193,6 +261,39 @@ class TestHAMT(unittest.TestCase):
         self.assertNotEqual(h1, h4)
         self.assertNotEqual(h1, {'a': 1, 'b': 2})
     
+    def test_equality_with_shared_structure(self):
+        base = HAMT((i, i) for i in range(1000))
+        v1 = base.set('extra', 1)
+        v2 = base.set('extra', 1)
+        v3 = base.set('extra', 2)
+        
+        self.assertEqual(v1, v2)
+        self.assertNotEqual(v1, v3)
+        self.assertNotEqual(v1, base.set('other', 1))
+        
+        pruned = base
+        for i in range(0, 1000, 3):
+            pruned = pruned.delete(i)
+        rebuilt = HAMT((i, i) for i in range(1000) if i % 3)
+        
+        self.assertEqual(pruned, rebuilt)
+        self.assertEqual(rebuilt, pruned)
+        self.assertNotEqual(pruned, rebuilt.set(1, 0))
+    
+    def test_hash(self):
+        h1 = HAMT({'a': 1, 'b': 2})
+        h2 = HAMT().set('b', 2).set('a', 1)
+        h3 = h1.set('b', 3)
+        
+        self.assertEqual(hash(h1), hash(h2))
+        self.assertEqual(hash(h1), hash(h1))
+        self.assertEqual(len({h1, h2, h3}), 2)
+        self.assertEqual({h1: 'x'}[h2], 'x')
+        self.assertEqual(hash(HAMT()), hash(HAMT()))
+        
+        with self.assertRaises(TypeError):
+            hash(HAMT({'a': []}))
+    
     def test_repr(self):
         h = HAMT()
         self.assertEqual(repr(h), 'HAMT({})')
@@ -6,6 +6,16 @@ import gc
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from hamt import HAMT
+from hamt.hamt import CollisionNode
+
+
+def collision_nodes(node):
+    if isinstance(node, CollisionNode):
+        return [node]
+    found = []
+    for child in node._nodes:
+        found.extend(collision_nodes(child))
+    return found
 
 
 class TestHAMTEdgeCases(unittest.TestCase):
@@ -98,7 +108,55 @@ class TestHAMTEdgeCases(unittest.TestCase):
         self.assertEqual(h[None], 'none_value')
         h = h.delete(None)
         self.assertFalse(None in h)
+
+    def test_none_key_with_none_value(self):
+        h = HAMT()
+        h = h.set(None, None)
+        h2 = h.set(None, 'value')
+        
+        self.assertEqual(list(h), [None])
+        self.assertIsNone(h[None])
+        self.assertEqual(h2[None], 'value')
+        self.assertEqual(len(h2), 1)
+    
+    def test_nan_key(self):
+        nan = float('nan')
+        h = HAMT().set(nan, 1).set('other', 0)
+        h2 = h.set(nan, 2)
+        
+        self.assertEqual(len(h2), 2)
+        self.assertEqual(h2[nan], 2)
+        self.assertEqual(h2, HAMT([(nan, 1), (nan, 2), ('other', 0)]))
+        
+        h3 = h2.delete(nan)
+        self.assertEqual(len(h3), 1)
+        self.assertFalse(nan in h3)
+        self.assertIs(HAMT().set(nan, 1).delete(nan), HAMT())
     
+    def test_collision_delete_keeps_remaining_key(self):
+        class SameHash:
+            def __init__(self, value, hash_value):
+                self.value = value
+                self.hash_value = hash_value
+            
+            def __hash__(self):
+                return self.hash_value
+            
+            def __eq__(self, other):
+                return isinstance(other, SameHash) and self.value == other.value
+        
+        for hash_value in (7, 2**63 - 1, -2**63):
+            with self.subTest(hash_value=hash_value):
+                h = HAMT()
+                h = h.set(SameHash(1, hash_value), 'one')
+                h = h.set(SameHash(2, hash_value), 'two')
+                self.assertEqual(len(collision_nodes(h._root)), 1)
+                h = h.delete(SameHash(1, hash_value))
+                
+                self.assertEqual(len(h), 1)
+                self.assertEqual(h[SameHash(2, hash_value)], 'two')
+                self.assertEqual(len(list(h)), 1)
+
     def test_complex_nested_values(self):
         h = HAMT()
         nested_value = {
@@ -132,34 +190,39 @@ class TestHAMTEdgeCases(unittest.TestCase):
     
     def test_many_collisions_stress(self):
         class AlwaysSameHash:
+            hash_value = 0
+            
             def __init__(self, value):
                 self.value = value
             
             def __hash__(self):
-                return 0  # Always same hash
+                return self.hash_value  # Always same hash
             
             def __eq__(self, other):
                 return isinstance(other, AlwaysSameHash) and self.value == other.value
         
-        h = HAMT()
-        n = 1000
-        
-        for i in range(n):
-            h = h.set(AlwaysSameHash(i), i)
-        
-        self.assertEqual(len(h), n)
-        
-        for i in range(n):
-            self.assertEqual(h[AlwaysSameHash(i)], i)
-        
-        # Delete half
-        for i in range(0, n, 2):
-            h = h.delete(AlwaysSameHash(i))
-        
-        self.assertEqual(len(h), n // 2)
-        
-        for i in range(1, n, 2):
-            self.assertEqual(h[AlwaysSameHash(i)], i)
+        for hash_value in (0, 2**63 - 1, -2**63):
+            with self.subTest(hash_value=hash_value):
+                AlwaysSameHash.hash_value = hash_value
+                h = HAMT()
+                n = 1000
+                
+                for i in range(n):
+                    h = h.set(AlwaysSameHash(i), i)
+                
+                self.assertEqual(len(h), n)
+                
+                for i in range(n):
+                    self.assertEqual(h[AlwaysSameHash(i)], i)
+                
+                # Delete half
+                for i in range(0, n, 2):
+                    h = h.delete(AlwaysSameHash(i))
+                
+                self.assertEqual(len(h), n // 2)
+                
+                for i in range(1, n, 2):
+                    self.assertEqual(h[AlwaysSameHash(i)], i)
     
     def test_memory_efficiency(self):
         base = HAMT()
@@ -181,6 +244,26 @@ class TestHAMTEdgeCases(unittest.TestCase):
             # Verify base is unchanged
             self.assertFalse(f'variant_{i}' in base)
     
+    def test_sizeof(self):
+        small = HAMT({i: i for i in range(10)})
+        large = HAMT({i: i for i in range(1000)})
+        
+        self.assertGreater(sys.getsizeof(small), sys.getsizeof(HAMT()))
+        self.assertGreater(sys.getsizeof(large), sys.getsizeof(small))
+    
+    def test_deletes_collapse_to_canonical_shape(self):
+        pruned = HAMT({i: i for i in range(1000)})
+        for i in range(0, 1000, 3):
+            pruned = pruned.delete(i)
+        rebuilt = HAMT({i: i for i in range(1000) if i % 3})
+        
+        self.assertEqual(sys.getsizeof(pruned), sys.getsizeof(rebuilt))
+        
+        for i in range(1000):
+            if i % 3:
+                pruned = pruned.delete(i)
+        self.assertIs(pruned, HAMT())
+    
     def test_concurrent_read_safety(self):
         h = HAMT()
         for i in range(100):
@@ -258,6 +341,40 @@ class TestHAMTEdgeCases(unittest.TestCase):
             key = i << 32
             self.assertEqual(h[key], i)
     
+    def test_high_bit_keys_do_not_collide(self):
+        # Hashes that differ only above bit 30 (and, with sign extension,
+        # only in the top four bits) must still land in separate slots
+        class TopBitsHash:
+            def __init__(self, value):
+                self.value = value
+            
+            def __hash__(self):
+                return 12345 + (self.value << 60)
+            
+            def __eq__(self, other):
+                return isinstance(other, TopBitsHash) and self.value == other.value
+        
+        int_keys = [i << 32 for i in range(1, 100)] + [-(i << 32) for i in range(1, 100)]
+        top_keys = [TopBitsHash(k) for k in range(-8, 8)]
+        
+        for keys in (int_keys, top_keys):
+            built = HAMT((key, i) for i, key in enumerate(keys))
+            incremental = HAMT()
+            for i, key in enumerate(keys):
+                incremental = incremental.set(key, i)
+            
+            for h in (built, incremental):
+                self.assertEqual(collision_nodes(h._root), [])
+                self.assertEqual(len(h), len(keys))
+                for i, key in enumerate(keys):
+                    self.assertEqual(h[key], i)
+                
+                for key in keys[::2]:
+                    h = h.delete(key)
+                self.assertEqual(len(h), len(keys) - len(keys[::2]))
+                for i, key in enumerate(keys):
+                    self.assertEqual(key in h, i % 2 == 1)
+    
     def test_equality_with_different_insertion_order(self):
         h1 = HAMT()
         h2 = HAMT()
@@ -303,6 +420,30 @@ class TestHAMTEdgeCases(unittest.TestCase):
         with self.assertRaises(TypeError):
             h[[]]
 
+    
+    def test_init_with_colliding_and_duplicate_keys(self):
+        class ModHash:
+            def __init__(self, value):
+                self.value = value
+            
+            def __hash__(self):
+                return self.value % 3
+            
+            def __eq__(self, other):
+                return isinstance(other, ModHash) and self.value == other.value
+        
+        items = [(ModHash(i), i) for i in range(100)]
+        items.append((ModHash(5), 'updated'))
+        h = HAMT(items)
+        
+        self.assertEqual(len(h), 100)
+        self.assertEqual(h[ModHash(5)], 'updated')
+        self.assertEqual(h[ModHash(99)], 99)
+        
+        h = h.delete(ModHash(5))
+        self.assertEqual(len(h), 99)
+        self.assertFalse(ModHash(5) in h)
+
 
 class TestHAMTPerformance(unittest.TestCase):
     
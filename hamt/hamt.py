@@ -1,7 +1,13 @@
+import sys
+
+
+_MISSING = object()
+
+
 class HAMTNode:
     __slots__ = ()
     
-    def find(self, shift, hash_val, key):
+    def find(self, shift, hash_val, key, default):
         raise NotImplementedError
     
     def assoc(self, shift, hash_val, key, value):
@@ -12,122 +18,137 @@ class HAMTNode:
 
 
 class BitmapNode(HAMTNode):
-    __slots__ = ('_bitmap', '_array')
+    __slots__ = ('_datamap', '_nodemap', '_kvs', '_nodes')
     
-    def __init__(self, bitmap, array):
-        self._bitmap = bitmap
-        self._array = array
+    def __init__(self, datamap, nodemap, kvs, nodes):
+        self._datamap = datamap
+        self._nodemap = nodemap
+        self._kvs = kvs
+        self._nodes = nodes
     
-    def find(self, shift, hash_val, key):
-        bit = 1 << ((hash_val >> shift) & 0x1f)
-        if not (self._bitmap & bit):
-            raise KeyError(key)
+    def find(self, shift, hash_val, key, default):
+        node = self
+        fragment = hash_val >> shift
         
-        idx = _popcount(self._bitmap & (bit - 1))
-        node_or_val = self._array[idx * 2]
-        
-        if node_or_val is None:
-            key_or_null = self._array[idx * 2]
-            val_or_node = self._array[idx * 2 + 1]
-            if key_or_null == key:
-                return val_or_node
-            raise KeyError(key)
-        
-        if isinstance(node_or_val, HAMTNode):
-            return node_or_val.find(shift + 5, hash_val, key)
-        
-        if node_or_val == key:
-            return self._array[idx * 2 + 1]
-        raise KeyError(key)
+        while True:
+            bit = 1 << (fragment & 0x3f)
+            datamap = node._datamap
+            
+            if datamap & bit:
+                idx = (datamap & (bit - 1)).bit_count() << 1
+                existing_key = node._kvs[idx]
+                if existing_key is key or existing_key == key:
+                    return node._kvs[idx + 1]
+                return default
+            
+            nodemap = node._nodemap
+            if not nodemap & bit:
+                return default
+            
+            node = node._nodes[(nodemap & (bit - 1)).bit_count()]
+            shift += 6
+            if node.__class__ is not BitmapNode:
+                return node.find(shift, hash_val, key, default)
+            fragment >>= 6
     
     def assoc(self, shift, hash_val, key, value):
-        bit = 1 << ((hash_val >> shift) & 0x1f)
-        idx = _popcount(self._bitmap & (bit - 1))
+        bit = 1 << ((hash_val >> shift) & 0x3f)
         
-        if self._bitmap & bit:
-            key_or_node = self._array[idx * 2]
-            val_or_node = self._array[idx * 2 + 1]
-            
-            if key_or_node is None and val_or_node is None:
-                return self
-            
-            if isinstance(key_or_node, HAMTNode):
-                new_node = key_or_node.assoc(shift + 5, hash_val, key, value)
-                if new_node is key_or_node:
-                    return self
-                new_array = self._array[:]
-                new_array[idx * 2] = new_node
-                return BitmapNode(self._bitmap, new_array)
+        if self._nodemap & bit:
+            idx = (self._nodemap & (bit - 1)).bit_count()
+            child = self._nodes[idx]
+            new_child, added = child.assoc(shift + 6, hash_val, key, value)
+            if new_child is child:
+                return self, False
+            nodes = self._nodes[:idx] + (new_child,) + self._nodes[idx + 1:]
+            return BitmapNode(self._datamap, self._nodemap, self._kvs, nodes), added
+        
+        idx = (self._datamap & (bit - 1)).bit_count() << 1
+        
+        if self._datamap & bit:
+            existing_key = self._kvs[idx]
+            existing_value = self._kvs[idx + 1]
             
-            if key_or_node == key:
-                if val_or_node is value:
-                    return self
-                new_array = self._array[:]
-                new_array[idx * 2 + 1] = value
-                return BitmapNode(self._bitmap, new_array)
+            if existing_key is key or existing_key == key:
+                if existing_value is value:
+                    return self, False
+                kvs = self._kvs[:idx + 1] + (value,) + self._kvs[idx + 2:]
+                return BitmapNode(self._datamap, self._nodemap, kvs, self._nodes), False
             
-            if shift >= 25:
-                new_node = CollisionNode([key_or_node, val_or_node, key, value])
+            if shift >= 60:
+                new_child = CollisionNode({existing_key: existing_value, key: value})
             else:
-                existing_hash = hash(key_or_node)
-                new_node = _create_node(shift + 5, key_or_node, val_or_node, 
-                                       hash_val, key, value)
+                new_child = _create_node(shift + 6, hash(existing_key), existing_key, existing_value,
+                                         hash_val, key, value)
             
-            new_array = self._array[:]
-            new_array[idx * 2] = new_node
-            new_array[idx * 2 + 1] = None
-            return BitmapNode(self._bitmap, new_array)
-        else:
-            n = _popcount(self._bitmap)
-            new_array = [None] * (2 * (n + 1))
-            new_array[:idx * 2] = self._array[:idx * 2]
-            new_array[idx * 2] = key
-            new_array[idx * 2 + 1] = value
-            new_array[idx * 2 + 2:] = self._array[idx * 2:]
-            return BitmapNode(self._bitmap | bit, new_array)
+            node_idx = (self._nodemap & (bit - 1)).bit_count()
+            kvs = self._kvs[:idx] + self._kvs[idx + 2:]
+            nodes = self._nodes[:node_idx] + (new_child,) + self._nodes[node_idx:]
+            return BitmapNode(self._datamap ^ bit, self._nodemap | bit, kvs, nodes), True
+        
+        kvs = self._kvs[:idx] + (key, value) + self._kvs[idx:]
+        return BitmapNode(self._datamap | bit, self._nodemap, kvs, self._nodes), True
     
     def without(self, shift, hash_val, key):
-        bit = 1 << ((hash_val >> shift) & 0x1f)
-        if not (self._bitmap & bit):
-            raise KeyError(key)
+        bit = 1 << ((hash_val >> shift) & 0x3f)
         
-        idx = _popcount(self._bitmap & (bit - 1))
-        key_or_node = self._array[idx * 2]
-        val_or_node = self._array[idx * 2 + 1]
+        if self._datamap & bit:
+            idx = (self._datamap & (bit - 1)).bit_count() << 1
+            existing_key = self._kvs[idx]
+            if existing_key is not key and existing_key != key:
+                raise KeyError(key)
+            
+            if self._datamap == bit and not self._nodemap:
+                return None
+            
+            kvs = self._kvs[:idx] + self._kvs[idx + 2:]
+            return BitmapNode(self._datamap ^ bit, self._nodemap, kvs, self._nodes)
         
-        if isinstance(key_or_node, HAMTNode):
-            new_node = key_or_node.without(shift + 5, hash_val, key)
-            if new_node is key_or_node:
-                return self
+        if self._nodemap & bit:
+            idx = (self._nodemap & (bit - 1)).bit_count()
+            new_child = self._nodes[idx].without(shift + 6, hash_val, key)
             
-            if new_node is None:
-                if _popcount(self._bitmap) == 1:
+            if new_child is None:
+                if self._nodemap == bit and not self._datamap:
                     return None
-                new_array = self._array[:idx * 2] + self._array[idx * 2 + 2:]
-                return BitmapNode(self._bitmap & ~bit, new_array)
+                nodes = self._nodes[:idx] + self._nodes[idx + 1:]
+                return BitmapNode(self._datamap, self._nodemap ^ bit, self._kvs, nodes)
             
-            new_array = self._array[:]
-            new_array[idx * 2] = new_node
-            return BitmapNode(self._bitmap, new_array)
-        
-        if key_or_node != key:
-            raise KeyError(key)
-        
-        if _popcount(self._bitmap) == 1:
-            return None
+            entry = new_child._single_entry()
+            if entry is not None:
+                data_idx = (self._datamap & (bit - 1)).bit_count() << 1
+                kvs = self._kvs[:data_idx] + entry + self._kvs[data_idx:]
+                nodes = self._nodes[:idx] + self._nodes[idx + 1:]
+                return BitmapNode(self._datamap | bit, self._nodemap ^ bit, kvs, nodes)
+            
+            nodes = self._nodes[:idx] + (new_child,) + self._nodes[idx + 1:]
+            return BitmapNode(self._datamap, self._nodemap, self._kvs, nodes)
         
-        new_array = self._array[:idx * 2] + self._array[idx * 2 + 2:]
-        return BitmapNode(self._bitmap & ~bit, new_array)
+        raise KeyError(key)
     
     def __iter__(self):
-        for i in range(0, len(self._array), 2):
-            key_or_node = self._array[i]
-            val_or_node = self._array[i + 1]
-            
-            if isinstance(key_or_node, HAMTNode):
-                yield from key_or_node
-            elif key_or_node is not None:
-                yield key_or_node
+        yield from self._kvs[::2]
+        for child in self._nodes:
+            yield from child
+    
+    def _iter_items(self):
+        kvs = self._kvs
+        yield from zip(kvs[::2], kvs[1::2])
+        for child in self._nodes:
+            yield from child._iter_items()
+    
+    def _single_entry(self):
+        if not self._nodemap and len(self._kvs) == 2:
+            return self._kvs
+        return None
+    
+    def _sizeof(self):
+        size = sys.getsizeof(self) + sys.getsizeof(self._kvs)
+        if self._nodes:
+            size += sys.getsizeof(self._nodes)
+            for child in self._nodes:
+                size += child._sizeof()
+        return size
 
 
 class CollisionNode(HAMTNode):
@@ -136,137 +157,177 @@ class CollisionNode(HAMTNode):
     def __init__(self, items):
         self._items = items
     
-    def find(self, shift, hash_val, key):
-        for i in range(0, len(self._items), 2):
-            if self._items[i] == key:
-                return self._items[i + 1]
-        raise KeyError(key)
+    def find(self, shift, hash_val, key, default):
+        return self._items.get(key, default)
     
     def assoc(self, shift, hash_val, key, value):
-        for i in range(0, len(self._items), 2):
-            if self._items[i] == key:
-                if self._items[i + 1] is value:
-                    return self
-                new_items = self._items[:]
-                new_items[i + 1] = value
-                return CollisionNode(new_items)
-        
-        new_items = self._items + [key, value]
-        return CollisionNode(new_items)
+        existing_value = self._items.get(key, _MISSING)
+        if existing_value is value:
+            return self, False
+        new_items = self._items.copy()
+        new_items[key] = value
+        return CollisionNode(new_items), existing_value is _MISSING
     
     def without(self, shift, hash_val, key):
-        for i in range(0, len(self._items), 2):
-            if self._items[i] == key:
-                new_items = self._items[:i] + self._items[i + 2:]
-                if len(new_items) == 2:
-                    return None
-                return CollisionNode(new_items)
-        raise KeyError(key)
+        if key not in self._items:
+            raise KeyError(key)
+        if len(self._items) == 1:
+            return None
+        new_items = self._items.copy()
+        del new_items[key]
+        return CollisionNode(new_items)
     
     def __iter__(self):
-        for i in range(0, len(self._items), 2):
-            yield self._items[i]
-
-
-def _popcount(x):
-    x = x - ((x >> 1) & 0x55555555)
-    x = (x & 0x33333333) + ((x >> 2) & 0x33333333)
-    x = (x + (x >> 4)) & 0x0f0f0f0f
-    x = x + (x >> 8)
-    x = x + (x >> 16)
-    return x & 0x3f
+        return iter(self._items)
+    
+    def _iter_items(self):
+        return iter(self._items.items())
+    
+    def _single_entry(self):
+        if len(self._items) == 1:
+            return next(iter(self._items.items()))
+        return None
+    
+    def _sizeof(self):
+        return sys.getsizeof(self) + sys.getsizeof(self._items)
 
 
-def _create_node(shift, key1, val1, hash2, key2, val2):
-    hash1 = hash(key1)
+def _create_node(shift, hash1, key1, val1, hash2, key2, val2):
+    if shift > 60:
+        return CollisionNode({key1: val1, key2: val2})
     
-    if shift > 25:
-        return CollisionNode([key1, val1, key2, val2])
-    
-    mask1 = (hash1 >> shift) & 0x1f
-    mask2 = (hash2 >> shift) & 0x1f
+    mask1 = (hash1 >> shift) & 0x3f
+    mask2 = (hash2 >> shift) & 0x3f
     
     if mask1 == mask2:
-        node = _create_node(shift + 5, key1, val1, hash2, key2, val2)
-        bitmap = 1 << mask1
-        return BitmapNode(bitmap, [node, None])
+        node = _create_node(shift + 6, hash1, key1, val1, hash2, key2, val2)
+        return BitmapNode(0, 1 << mask1, (), (node,))
     else:
         bitmap = (1 << mask1) | (1 << mask2)
         if mask1 < mask2:
-            return BitmapNode(bitmap, [key1, val1, key2, val2])
+            return BitmapNode(bitmap, 0, (key1, val1, key2, val2), ())
+        else:
+            return BitmapNode(bitmap, 0, (key2, val2, key1, val1), ())
+
+
+def _build_node(entries, shift):
+    buckets = {}
+    for entry in entries:
+        fragment = (entry[0] >> shift) & 0x3f
+        if fragment in buckets:
+            buckets[fragment].append(entry)
+        else:
+            buckets[fragment] = [entry]
+    
+    datamap = 0
+    nodemap = 0
+    kvs = []
+    nodes = []
+    size = 0
+    for fragment in sorted(buckets):
+        bucket = buckets[fragment]
+        bit = 1 << fragment
+        
+        if len(bucket) == 1:
+            _, key, value = bucket[0]
+        elif shift >= 60:
+            items = {key: value for _, key, value in bucket}
+            if len(items) > 1:
+                nodemap |= bit
+                nodes.append(CollisionNode(items))
+                size += len(items)
+                continue
+            (key, value), = items.items()
         else:
-            return BitmapNode(bitmap, [key2, val2, key1, val1])
+            node, node_size = _build_node(bucket, shift + 6)
+            if node_size > 1:
+                nodemap |= bit
+                nodes.append(node)
+                size += node_size
+                continue
+            key, value = node._kvs
+        
+        datamap |= bit
+        kvs.append(key)
+        kvs.append(value)
+        size += 1
+    
+    return BitmapNode(datamap, nodemap, tuple(kvs), tuple(nodes)), size
+
+
+def _node_eq(a, b):
+    if a is b:
+        return True
+    if a.__class__ is not b.__class__:
+        return False
+    if a.__class__ is CollisionNode:
+        return a._items == b._items
+    if a._datamap != b._datamap or a._nodemap != b._nodemap or a._kvs != b._kvs:
+        return False
+    for child_a, child_b in zip(a._nodes, b._nodes):
+        if not _node_eq(child_a, child_b):
+            return False
+    return True
 
 
 class HAMT:
-    __slots__ = ('_root', '_size')
+    __slots__ = ('_root', '_size', '_hash')
+    
+    def __new__(cls, items=None):
+        if items or cls is not HAMT:
+            return object.__new__(cls)
+        return _EMPTY_HAMT
     
     def __init__(self, items=None):
+        if self is _EMPTY_HAMT:
+            return
+        
         self._root = None
         self._size = 0
+        self._hash = None
         
         if items:
             if hasattr(items, 'items'):
                 items = items.items()
             
-            for key, value in items:
-                self._root, added = self._assoc_with_added(self._root, 0, hash(key), key, value)
-                if added:
-                    self._size += 1
-    
-    def _assoc_with_added(self, node, shift, hash_val, key, value):
-        if node is None:
-            return BitmapNode(1 << ((hash_val >> shift) & 0x1f), [key, value]), True
-        
-        try:
-            existing = node.find(shift, hash_val, key)
-            new_node = node.assoc(shift, hash_val, key, value)
-            return new_node, False
-        except KeyError:
-            new_node = node.assoc(shift, hash_val, key, value)
-            return new_node, True
+            entries = [(hash(key), key, value) for key, value in items]
+            if entries:
+                self._root, self._size = _build_node(entries, 0)
     
     def get(self, key, default=None):
         if self._root is None:
             return default
-        try:
-            return self._root.find(0, hash(key), key)
-        except KeyError:
-            return default
+        return self._root.find(0, hash(key), key, default)
     
     def __getitem__(self, key):
         if self._root is None:
             raise KeyError(key)
-        return self._root.find(0, hash(key), key)
+        value = self._root.find(0, hash(key), key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
     
     def set(self, key, value):
-        new_hamt = HAMT()
+        hash_val = hash(key)
         if self._root is None:
-            new_hamt._root = BitmapNode(1 << (hash(key) & 0x1f), [key, value])
-            new_hamt._size = 1
-        else:
-            new_hamt._root, added = self._assoc_with_added(self._root, 0, hash(key), key, value)
-            new_hamt._size = self._size + (1 if added else 0)
-        return new_hamt
+            return _make_hamt(BitmapNode(1 << (hash_val & 0x3f), 0, (key, value), ()), 1)
+        
+        new_root, added = self._root.assoc(0, hash_val, key, value)
+        if new_root is self._root:
+            return self
+        return _make_hamt(new_root, self._size + (1 if added else 0))
     
     def delete(self, key):
         if self._root is None:
             raise KeyError(key)
         
         new_root = self._root.without(0, hash(key), key)
-        new_hamt = HAMT()
-        new_hamt._root = new_root
-        new_hamt._size = self._size - 1
-        return new_hamt
+        return _make_hamt(new_root, self._size - 1)
     
     def __contains__(self, key):
         if self._root is None:
             return False
-        try:
-            self._root.find(0, hash(key), key)
-            return True
-        except KeyError:
-            return False
+        return self._root.find(0, hash(key), key, _MISSING) is not _MISSING
     
     def __len__(self):
         return self._size
@@ -279,10 +340,12 @@ class HAMT:
         return list(self)
     
     def values(self):
-        return [self[k] for k in self]
+        return [v for _, v in self.items()]
     
     def items(self):
-        return [(k, self[k]) for k in self]
+        if self._root is None:
+            return []
+        return list(self._root._iter_items())
     
     def __repr__(self):
         if self._size == 0:
@@ -290,12 +353,45 @@ class HAMT:
         items = ', '.join(f'{k!r}: {v!r}' for k, v in self.items())
         return f'HAMT({{{items}}})'
     
+    def __reduce__(self):
+        return (self.__class__, (self.items(),))
+    
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, HAMT):
             return False
         if len(self) != len(other):
             return False
-        for key in self:
-            if key not in other or self[key] != other[key]:
-                return False
-        return True
\ No newline at end of file
+        if self._hash is not None and other._hash is not None and self._hash != other._hash:
+            return False
+        if self._root is None:
+            return True
+        return _node_eq(self._root, other._root)
+    
+    def __sizeof__(self):
+        size = object.__sizeof__(self)
+        if self._root is not None:
+            size += self._root._sizeof()
+        return size
+    
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self.items()))
+        return self._hash
+
+
+def _make_hamt(root, size):
+    if root is None:
+        return _EMPTY_HAMT
+    hamt = object.__new__(HAMT)
+    hamt._root = root
+    hamt._size = size
+    hamt._hash = None
+    return hamt
+
+
+_EMPTY_HAMT = object.__new__(HAMT)
+_EMPTY_HAMT._root = None
+_EMPTY_HAMT._size = 0
+_EMPTY_HAMT._hash = None
\ No newline at end of file
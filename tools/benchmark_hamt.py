@@ -1,55 +1,378 @@
+import cProfile
+import csv
+import functools
+import gc
+import io
+import json
+import os
+import platform
 import time
 import random
+import statistics
+from collections import deque
+from contextlib import contextmanager, redirect_stdout
 import string
+import subprocess
 import sys
+import tracemalloc
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from hamt import HAMT
 
+try:
+    import immutables
+except ImportError:
+    immutables = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import yappi
+except ImportError:
+    yappi = None
+
+try:
+    import pyinstrument
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    pyinstrument = None
+
+
+REPEAT = 5
+WARMUP = 0
+KEYTYPE = 'str'
+
 
 def generate_random_string(length=10):
     return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
 
 
+# Fixtures are cached per (size, keytype) and shared between benchmarks;
+# callers must not mutate them.
+@functools.lru_cache(maxsize=None)
+def base_keys(n, keytype):
+    # int keys hash to themselves, isolating trie traversal from string hashing
+    if keytype == 'int':
+        return list(range(n))
+    # Interned, so the dict and HAMT key checks both hit their identity
+    # fast path instead of comparing string contents.
+    return [sys.intern(f'key{i}') for i in range(n)]
+
+
+@functools.lru_cache(maxsize=None)
+def base_dict(n, keytype):
+    return dict(zip(base_keys(n, keytype), range(n)))
+
+
+@functools.lru_cache(maxsize=None)
+def base_hamt(n, keytype):
+    return HAMT(base_dict(n, keytype))
+
+
+@functools.lru_cache(maxsize=None)
+def bad_hash_keys(n):
+    return [BadHash(i) for i in range(n)]
+
+
+def make_keys(n):
+    return base_keys(n, KEYTYPE)
+
+
+@contextmanager
+def timed_region():
+    # Collect first so no generation is near its threshold, then keep the
+    # garbage collector (like timeit) and thread switches out of the region.
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    switch_interval = sys.getswitchinterval()
+    gc.disable()
+    sys.setswitchinterval(1.0)
+    start = time.perf_counter_ns()
+    try:
+        yield lambda: time.perf_counter_ns() - start
+    finally:
+        sys.setswitchinterval(switch_interval)
+        if gc_was_enabled:
+            gc.enable()
+
+
+def time_ns(func):
+    # Wall clock rather than process_time_ns(): the benchmarks never sleep or
+    # block, and process_time's coarser resolution on some platforms would
+    # swamp the sub-millisecond small-size runs. Preemption noise is handled
+    # by repeating and taking the minimum.
+    with timed_region() as elapsed:
+        result = func()
+        elapsed_ns = elapsed()
+    return elapsed_ns, result
+
+
+def traced_memory(func):
+    # A separate, untimed pass: tracemalloc slows every allocation down.
+    # Returns the bytes still allocated by func()'s result.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = func()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return after - before, result
+
+
+def best_of(run):
+    # run() does any per-repetition setup and returns time_ns(...) of the measured part.
+    # Warmup runs are discarded so a JIT (PyPy) can trace the hot paths first.
+    for _ in range(WARMUP):
+        run()
+    samples = []
+    for _ in range(REPEAT):
+        elapsed, result = run()
+        samples.append(elapsed)
+    return min(samples), statistics.median(samples), result
+
+
+def format_ns(ns):
+    return f"{ns / 1e6:.3f}ms"
+
+
+def print_timing(label, best, median):
+    print(f"  {label}: {format_ns(best)} (median {format_ns(median)})")
+
+
+def git_sha():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).parent,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Reporter:
+    # Collects one record per comparison. The text reporter only prints as
+    # the benchmarks run; subclasses also dump the records at the end.
+    fields = ('benchmark', 'size', 'baseline', 'baseline_ns', 'baseline_median_ns',
+              'hamt_ns', 'hamt_median_ns', 'ratio', 'python', 'git_sha', 'cpu')
+    
+    def __init__(self, size=None):
+        self.size = size
+        self.records = []
+    
+    def record(self, benchmark, baseline, baseline_ns, baseline_median_ns, hamt_ns, hamt_median_ns):
+        self.records.append({
+            'benchmark': benchmark,
+            'size': self.size,
+            'baseline': baseline,
+            'baseline_ns': baseline_ns,
+            'baseline_median_ns': baseline_median_ns,
+            'hamt_ns': hamt_ns,
+            'hamt_median_ns': hamt_median_ns,
+            'ratio': hamt_ns / baseline_ns,
+        })
+    
+    def environment(self):
+        return {
+            'python': f"{platform.python_implementation()} {platform.python_version()}",
+            'git_sha': git_sha(),
+            'cpu': platform.processor() or platform.machine(),
+        }
+    
+    def dump(self, f):
+        pass
+
+
+class JSONReporter(Reporter):
+    def dump(self, f):
+        environment = self.environment()
+        json.dump([{**record, **environment} for record in self.records], f, indent=2)
+        f.write('\n')
+
+
+class CSVReporter(Reporter):
+    def dump(self, f):
+        environment = self.environment()
+        writer = csv.DictWriter(f, fieldnames=self.fields)
+        writer.writeheader()
+        writer.writerows({**record, **environment} for record in self.records)
+
+
+REPORTERS = {'text': Reporter, 'json': JSONReporter, 'csv': CSVReporter}
+REPORTER = Reporter()
+
+
+def pin_to_cpu(cpu):
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+    elif psutil is not None and hasattr(psutil.Process, 'cpu_affinity'):
+        psutil.Process().cpu_affinity([cpu])
+    else:
+        print(f"warning: cannot pin to CPU {cpu} on this platform", file=sys.stderr)
+        return
+    
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        os.nice(-5)
+    
+    # Hyperthread siblings share L1D/L2, so another busy process there still adds noise
+    siblings_path = Path(f'/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list')
+    try:
+        siblings = siblings_path.read_text().strip()
+    except OSError:
+        return
+    if siblings != str(cpu):
+        print(f"warning: CPU {cpu} shares its core with SMT siblings {siblings}", file=sys.stderr)
+
+
+def run_profiled(profiler, name, func, *args):
+    if profiler is None:
+        return func(*args)
+    
+    if profiler == 'cprofile':
+        path = f'{name}.prof'
+        pr = cProfile.Profile()
+        pr.enable()
+        try:
+            result = func(*args)
+        finally:
+            pr.disable()
+        pr.dump_stats(path)
+    elif profiler == 'yappi':
+        path = f'{name}.prof'
+        yappi.clear_stats()
+        yappi.start()
+        try:
+            result = func(*args)
+        finally:
+            yappi.stop()
+        yappi.get_func_stats().save(path, type='pstat')
+    else:
+        # Sampling profiler with lower overhead; open the output in speedscope.app
+        path = f'{name}.speedscope.json'
+        pr = pyinstrument.Profiler()
+        pr.start()
+        try:
+            result = func(*args)
+        finally:
+            pr.stop()
+        with open(path, 'w') as f:
+            f.write(pr.output(SpeedscopeRenderer()))
+    
+    print(f"  Profile written to {path}")
+    return result
+
+
+class BadHash:
+    __slots__ = ('value',)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def __hash__(self):
+        return self.value % 10
+    
+    def __eq__(self, other):
+        return isinstance(other, BadHash) and self.value == other.value
+
+
+def insert_collisions_dict(bad):
+    d = {}
+    for x in bad:
+        d[x] = x.value
+    return d
+
+
+def insert_collisions_hamt(bad):
+    h = HAMT()
+    for x in bad:
+        h = h.set(x, x.value)
+    return h
+
+
 def benchmark_insertions(n=10000):
     print(f"\nBenchmarking {n} insertions:")
     
-    start = time.perf_counter()
-    d = {}
-    for i in range(n):
-        d[f'key{i}'] = i
-    dict_time = time.perf_counter() - start
-    print(f"  dict: {dict_time:.4f}s")
+    keys = make_keys(n)
     
-    start = time.perf_counter()
-    h = HAMT()
-    for i in range(n):
-        h = h.set(f'key{i}', i)
-    hamt_time = time.perf_counter() - start
-    print(f"  HAMT: {hamt_time:.4f}s")
+    def insert_dict():
+        d = {}
+        for i, key in enumerate(keys):
+            d[key] = i
+        return d
+    
+    def insert_hamt():
+        h = HAMT()
+        for i, key in enumerate(keys):
+            h = h.set(key, i)
+        return h
+    
+    dict_time, dict_median, d = best_of(lambda: time_ns(insert_dict))
+    print_timing("dict", dict_time, dict_median)
+    
+    hamt_time, hamt_median, h = best_of(lambda: time_ns(insert_hamt))
+    print_timing("HAMT", hamt_time, hamt_median)
     print(f"  Ratio (HAMT/dict): {hamt_time/dict_time:.2f}x")
+    REPORTER.record('insertions', 'dict', dict_time, dict_median, hamt_time, hamt_median)
     
-    return d, h
+    return d, h, keys
 
 
-def benchmark_lookups(d, h, n=10000):
+def benchmark_lookups(d, h, n=10000, keys=None):
     print(f"\nBenchmarking {n} lookups:")
     
-    keys = [f'key{random.randint(0, len(d)-1)}' for _ in range(n)]
+    if keys is None:
+        keys = list(d)
+    # One C-level draw over the existing keys: uniform over the keys actually
+    # present (with repeats when n > len(keys)), and no new strings allocated.
+    sample = random.choices(keys, k=n)
+    
+    def lookup(m):
+        for key in sample:
+            _ = m[key]
     
-    start = time.perf_counter()
-    for key in keys:
-        _ = d[key]
-    dict_time = time.perf_counter() - start
-    print(f"  dict: {dict_time:.4f}s")
+    dict_time, dict_median, _ = best_of(lambda: time_ns(lambda: lookup(d)))
+    print_timing("dict", dict_time, dict_median)
     
-    start = time.perf_counter()
-    for key in keys:
-        _ = h[key]
-    hamt_time = time.perf_counter() - start
-    print(f"  HAMT: {hamt_time:.4f}s")
+    hamt_time, hamt_median, _ = best_of(lambda: time_ns(lambda: lookup(h)))
+    print_timing("HAMT", hamt_time, hamt_median)
     print(f"  Ratio (HAMT/dict): {hamt_time/dict_time:.2f}x")
+    REPORTER.record('lookups', 'dict', dict_time, dict_median, hamt_time, hamt_median)
+
+
+def benchmark_lookups_miss(d, h, n=10000):
+    print(f"\nBenchmarking {n} missed lookups:")
+    
+    if KEYTYPE == 'int':
+        miss_keys = [-1 - i for i in range(n)]
+    else:
+        miss_keys = [sys.intern(f'nokey{i}') for i in range(n)]
+    
+    def lookup_get(m):
+        for key in miss_keys:
+            m.get(key)
+    
+    def lookup_raise(m):
+        for key in miss_keys:
+            try:
+                m[key]
+            except KeyError:
+                pass
+    
+    dict_time, dict_median, _ = best_of(lambda: time_ns(lambda: lookup_get(d)))
+    print_timing("dict.get", dict_time, dict_median)
+    
+    hamt_time, hamt_median, _ = best_of(lambda: time_ns(lambda: lookup_get(h)))
+    print_timing("HAMT.get", hamt_time, hamt_median)
+    print(f"  Ratio (HAMT/dict): {hamt_time/dict_time:.2f}x")
+    
+    raise_time, raise_median, _ = best_of(lambda: time_ns(lambda: lookup_raise(h)))
+    print_timing("HAMT[] + KeyError", raise_time, raise_median)
+    print(f"  Ratio (KeyError/get): {raise_time/hamt_time:.2f}x")
+    REPORTER.record('lookups_miss', 'dict', dict_time, dict_median, hamt_time, hamt_median)
+    REPORTER.record('lookups_miss_keyerror', 'HAMT.get', hamt_time, hamt_median, raise_time, raise_median)
 
 
 def benchmark_deletions(n=5000):
@@ -57,87 +380,44 @@ def benchmark_deletions(n=5000):
     
     # Ensure we have enough items to delete
     total_items = n * 2
-    d = {f'key{i}': i for i in range(total_items)}
-    start = time.perf_counter()
-    for i in range(n):
-        del d[f'key{i}']
-    dict_time = time.perf_counter() - start
-    print(f"  dict: {dict_time:.4f}s")
-    
-    h = HAMT({f'key{i}': i for i in range(total_items)})
-    start = time.perf_counter()
-    for i in range(n):
-        h = h.delete(f'key{i}')
-    hamt_time = time.perf_counter() - start
-    print(f"  HAMT: {hamt_time:.4f}s")
-    print(f"  Ratio (HAMT/dict): {hamt_time/dict_time:.2f}x")
-
-
-def benchmark_iteration(d, h):
-    print(f"\nBenchmarking iteration over {len(d)} items:")
+    keys = make_keys(total_items)
+    del_keys = keys[:n]
     
-    start = time.perf_counter()
-    total = sum(1 for _ in d)
-    dict_time = time.perf_counter() - start
-    print(f"  dict: {dict_time:.4f}s")
+    start_dict = base_dict(total_items, KEYTYPE)
+    start_hamt = base_hamt(total_items, KEYTYPE)
     
-    start = time.perf_counter()
-    total = sum(1 for _ in h)
-    hamt_time = time.perf_counter() - start
-    print(f"  HAMT: {hamt_time:.4f}s")
-    print(f"  Ratio (HAMT/dict): {hamt_time/dict_time:.2f}x")
-
-
-def benchmark_memory_sharing():
-    print("\nTesting memory sharing (structural sharing):")
+    def delete_dict(d):
+        for key in del_keys:
+            del d[key]
     
-    base = HAMT()
-    for i in range(1000):
-        base = base.set(f'key{i}', i)
+    def delete_hamt(h):
+        for key in del_keys:
+            h = h.delete(key)
+        return h
     
-    print(f"  Created base HAMT with 1000 items")
+    def run_dict():
+        d = start_dict.copy()
+        return time_ns(lambda: delete_dict(d))
     
-    variants = []
-    start = time.perf_counter()
-    for i in range(100):
-        variant = base.set(f'extra{i}', i)
-        variants.append(variant)
-    creation_time = time.perf_counter() - start
+    dict_time, dict_median, _ = best_of(run_dict)
+    print_timing("dict", dict_time, dict_median)
     
-    print(f"  Created 100 variants in {creation_time:.4f}s")
-    print(f"  Average time per variant: {creation_time/100*1000:.2f}ms")
-    print(f"  (Each variant shares most nodes with the base)")
+    hamt_time, hamt_median, _ = best_of(lambda: time_ns(lambda: delete_hamt(start_hamt)))
+    print_timing("HAMT", hamt_time, hamt_median)
+    print(f"  Ratio (HAMT/dict): {hamt_time/dict_time:.2f}x")
+    REPORTER.record('deletions', 'dict', dict_time, dict_median, hamt_time, hamt_median)
 
 
-def benchmark_hash_collisions():
-    print("\nBenchmarking with hash collisions:")
-    
-    class BadHash:
-        def __init__(self, value):
-            self.value = value
-        
-        def __hash__(self):
-            return self.value % 10
-        
-        def __eq__(self, other):
-            return isinstance(other, BadHash) and self.value == other.value
-    
-    n = 1000
+def benchmark_iteration(d, h):
+    print(f"\nBenchmarking iteration over {len(d)} items:")
     
-    d = {}
-    start = time.perf_counter()
-    for i in range(n):
-        d[BadHash(i)] = i
-    dict_time = time.perf_counter() - start
-    print(f"  dict with collisions: {dict_time:.4f}s")
+    dict_time, dict_median, _ = best_of(lambda: time_ns(lambda: deque(d, maxlen=0)))
+    print_timing("dict", dict_time, dict_median)
     
-    h = HAMT()
-    start = time.perf_counter()
-    for i in range(n):
-        h = h.set(BadHash(i), i)
-    hamt_time = time.perf_counter() - start
-    print(f"  HAMT with collisions: {hamt_time:.4f}s")
+    hamt_time, hamt_median, _ = best_of(lambda: time_ns(lambda: deque(h, maxlen=0)))
+    print_timing("HAMT", hamt_time, hamt_median)
     print(f"  Ratio (HAMT/dict): {hamt_time/dict_time:.2f}x")
+    REPORTER.record('iteration', 'dict', dict_time, dict_median, hamt_time, hamt_median)
 
 
 def main():
@@ -147,8 +427,49 @@ def main():
     parser.add_argument('--size', type=str, default='medium',
                         choices=['small', 'medium', 'large'],
                         help='Benchmark size: small, medium, or large')
+    parser.add_argument('--runtime', type=str, default=None,
+                        choices=['cpython', 'pypy'],
+                        help='Fail unless running under this Python implementation')
+    parser.add_argument('--warmup', type=int, default=0,
+                        help='Untimed runs of each benchmark before measuring (useful under PyPy)')
+    parser.add_argument('--jit-warmup', type=int, default=0,
+                        help='Discarded passes over the whole suite before the measured pass')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed; pass i of the suite uses seed + i')
+    parser.add_argument('--profile', type=str, default=None,
+                        choices=['cprofile', 'yappi', 'pyinstrument'],
+                        help='Profile each benchmark and write a .prof (or speedscope JSON) per benchmark; timings are inflated')
+    parser.add_argument('--keytype', type=str, default='str',
+                        choices=['str', 'int'],
+                        help='Key type for the insertion, lookup and deletion benchmarks')
+    parser.add_argument('--cpu', type=int, default=None,
+                        help='Pin the process to this CPU for the whole run')
+    parser.add_argument('--output', type=str, default='text',
+                        choices=sorted(REPORTERS),
+                        help='Result format; json and csv write one record per comparison')
+    parser.add_argument('--output-file', type=str, default=None,
+                        help='Write results here instead of stdout')
     args = parser.parse_args()
     
+    if args.profile == 'yappi' and yappi is None:
+        parser.error("--profile yappi requires the 'yappi' package")
+    if args.profile == 'pyinstrument' and pyinstrument is None:
+        parser.error("--profile pyinstrument requires the 'pyinstrument' package")
+    
+    implementation = platform.python_implementation()
+    if args.runtime is not None and implementation.lower() != args.runtime:
+        parser.error(f"--runtime {args.runtime} requested but running under {implementation}")
+    
+    if args.cpu is not None:
+        try:
+            pin_to_cpu(args.cpu)
+        except (OSError, ValueError) as e:
+            parser.error(f"--cpu {args.cpu}: {e}")
+    
+    global WARMUP, KEYTYPE, REPORTER
+    WARMUP = args.warmup
+    KEYTYPE = args.keytype
+    
     # Define size parameters
     sizes = {
         'small': {
@@ -182,17 +503,53 @@ def main():
     
     size_config = sizes[args.size]
     
+    # Whole-suite passes whose output and records are thrown away, each with
+    # a different seed so a JIT does not specialize on a single input
+    for pass_index in range(args.jit_warmup):
+        random.seed(args.seed + pass_index)
+        REPORTER = Reporter(args.size)
+        with redirect_stdout(io.StringIO()):
+            run_benchmarks(size_config, None)
+        print(f"warmup pass {pass_index + 1}/{args.jit_warmup} done", file=sys.stderr)
+    
+    random.seed(args.seed + args.jit_warmup)
+    REPORTER = REPORTERS[args.output](args.size)
+    
+    out = open(args.output_file, 'w', newline='') if args.output_file else sys.stdout
+    try:
+        if args.output == 'text':
+            report_to = out
+        else:
+            # Keep the records on their own stream; the readable report goes elsewhere
+            report_to = sys.stderr if out is sys.stdout else sys.stdout
+        with redirect_stdout(report_to):
+            run_benchmarks(size_config, args.profile)
+        REPORTER.dump(out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def run_benchmarks(size_config, profile):
+    implementation = platform.python_implementation()
+    
     print("=" * 60)
     print(f"HAMT Performance Benchmarks - {size_config['label']} Dataset")
+    print(f"{implementation} {platform.python_version()}, warmup {WARMUP}, best of {REPEAT}, {KEYTYPE} keys")
     print("=" * 60)
     
     # Run benchmarks with size-specific parameters
-    d, h = benchmark_insertions(size_config['insertions'])
-    benchmark_lookups(d, h, size_config['lookups'])
-    benchmark_deletions(size_config['deletions'])
-    benchmark_iteration(d, h)
-    benchmark_memory_sharing_sized(size_config['memory_base'], size_config['memory_variants'])
-    benchmark_hash_collisions_sized(size_config['collisions'])
+    d, h, keys = run_profiled(profile, 'insertions', benchmark_insertions, size_config['insertions'])
+    run_profiled(profile, 'lookups', benchmark_lookups, d, h, size_config['lookups'], keys)
+    run_profiled(profile, 'lookups_miss', benchmark_lookups_miss, d, h, size_config['lookups'])
+    run_profiled(profile, 'deletions', benchmark_deletions, size_config['deletions'])
+    run_profiled(profile, 'iteration', benchmark_iteration, d, h)
+    run_profiled(profile, 'memory_sharing', benchmark_memory_sharing_sized,
+                 size_config['memory_base'], size_config['memory_variants'])
+    run_profiled(profile, 'batched_variants', benchmark_batched_variants,
+                 size_config['memory_base'], size_config['memory_variants'])
+    run_profiled(profile, 'hash_collisions', benchmark_hash_collisions_sized, size_config['collisions'])
+    run_profiled(profile, 'c_hamt', benchmark_c_hamt, size_config['insertions'], size_config['lookups'])
     
     print("\n" + "=" * 60)
     print("Summary:")
@@ -200,6 +557,8 @@ def main():
     print("  - Performance is typically 2-10x slower than dict")
     print("  - Best for functional programming and concurrent access")
     print("  - Memory efficient when creating many similar copies")
+    if KEYTYPE == 'str':
+        print("  - String keys are interned and lookups reuse the same key objects")
     print("=" * 60)
 
 
@@ -210,100 +569,174 @@ def benchmark_memory_sharing_sized(base_size, variant_count):
     print(f"\nTesting structural sharing vs copying ({base_size} base items, {variant_count} variants):")
     
     # Create base dictionary
-    base_dict = {i: i for i in range(base_size)}
+    start_dict = base_dict(base_size, 'int')
+    
+    # Generate the new keys up front so only the variant updates are timed
+    extra_items = [(f'extra{i}', i) for i in range(variant_count)]
+    mod_items = [(f'mod{j}', j) for j in range(10)]
     
     # Test dict copying (full copy each time)
-    dict_variants = []
-    start = time.perf_counter()
-    for i in range(variant_count):
-        variant = base_dict.copy()
-        variant[f'extra{i}'] = i
-        dict_variants.append(variant)
-    dict_time = time.perf_counter() - start
+    def copy_variants():
+        dict_variants = []
+        for key, value in extra_items:
+            variant = start_dict.copy()
+            variant[key] = value
+            dict_variants.append(variant)
+        return dict_variants
     
-    # Estimate memory usage for dict copies
-    dict_memory_estimate = sys.getsizeof(base_dict) * variant_count
+    dict_time, dict_median, dict_variants = best_of(lambda: time_ns(copy_variants))
+    
+    # dict.copy() duplicates only the hash table; the keys and values are
+    # shared by reference. Each variant also holds one key/value of its own.
+    dict_memory_estimate = sum(sys.getsizeof(variant) for variant in dict_variants)
+    plus_extras = sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in extra_items)
     
     print(f"\n  Dict (copy) approach:")
-    print(f"    Time to create {variant_count} variants: {dict_time:.4f}s")
-    print(f"    Average time per variant: {dict_time/variant_count*1000:.2f}ms")
-    print(f"    Estimated memory: ~{dict_memory_estimate / 1024:.1f} KB")
-    print(f"    (Each variant is a full copy)")
+    print(f"    Time to create {variant_count} variants: {format_ns(dict_time)} (median {format_ns(dict_median)})")
+    print(f"    Average time per variant: {format_ns(dict_time / variant_count)}")
+    print(f"    Estimated memory: ~{dict_memory_estimate / 1024:.1f} KB of hash tables "
+          f"(+{plus_extras / 1024:.1f} KB for the new items)")
+    print(f"    (Each variant copies the table; keys and values are shared)")
     
     # Test HAMT structural sharing
-    base_hamt = HAMT()
-    for i in range(base_size):
-        base_hamt = base_hamt.set(i, i)
+    start_hamt = base_hamt(base_size, 'int')
+    gc.collect()
+    
+    def share_variants():
+        hamt_variants = []
+        for key, value in extra_items:
+            variant = start_hamt.set(key, value)
+            hamt_variants.append(variant)
+        return hamt_variants
     
-    hamt_variants = []
-    start = time.perf_counter()
-    for i in range(variant_count):
-        variant = base_hamt.set(f'extra{i}', i)
-        hamt_variants.append(variant)
-    hamt_time = time.perf_counter() - start
+    hamt_time, hamt_median, hamt_variants = best_of(lambda: time_ns(share_variants))
+    REPORTER.record('memory_sharing', 'dict.copy', dict_time, dict_median, hamt_time, hamt_median)
     
     print(f"\n  HAMT (structural sharing) approach:")
-    print(f"    Time to create {variant_count} variants: {hamt_time:.4f}s")
-    print(f"    Average time per variant: {hamt_time/variant_count*1000:.2f}ms")
+    print(f"    Time to create {variant_count} variants: {format_ns(hamt_time)} (median {format_ns(hamt_median)})")
+    print(f"    Average time per variant: {format_ns(hamt_time / variant_count)}")
     print(f"    (Variants share most nodes with base)")
     
+    dict_memory, _ = traced_memory(copy_variants)
+    hamt_memory, _ = traced_memory(share_variants)
+    
+    print(f"\n  Measured memory for the variants (tracemalloc):")
+    print(f"    Dict: {dict_memory / 1024:.1f} KB ({dict_memory / variant_count:.0f} bytes per variant)")
+    print(f"    HAMT: {hamt_memory / 1024:.1f} KB ({hamt_memory / variant_count:.0f} bytes per variant)")
+    
     print(f"\n  Performance comparison:")
     if hamt_time < dict_time:
         print(f"    Speed: HAMT is {dict_time/hamt_time:.2f}x faster than dict.copy()")
     else:
         print(f"    Speed: dict.copy() is {hamt_time/dict_time:.2f}x faster than HAMT")
     print(f"    Memory efficiency: HAMT shares ~{(base_size/(base_size+1))*100:.1f}% of structure")
-    print(f"    Memory savings: ~{((dict_memory_estimate - (dict_memory_estimate/variant_count))/dict_memory_estimate)*100:.1f}% less memory with HAMT")
+    print(f"    Memory savings: {(1 - hamt_memory / dict_memory) * 100:.1f}% less memory with HAMT")
     
     # Test modification performance
     print(f"\n  Testing cascading modifications:")
     
     # Dict approach - modifying multiple copies
-    start = time.perf_counter()
-    for variant in dict_variants[:10]:
-        for j in range(10):
-            variant[f'mod{j}'] = j
-    dict_mod_time = time.perf_counter() - start
+    def modify_dicts(variants):
+        for variant in variants:
+            for key, value in mod_items:
+                variant[key] = value
+    
+    def run_dict_mods():
+        # Modifications are in place, so each repetition works on fresh copies
+        variants = [variant.copy() for variant in dict_variants[:10]]
+        return time_ns(lambda: modify_dicts(variants))
     
     # HAMT approach - creating new versions
-    start = time.perf_counter()
-    for variant in hamt_variants[:10]:
-        for j in range(10):
-            variant = variant.set(f'mod{j}', j)
-    hamt_mod_time = time.perf_counter() - start
-    
-    print(f"    Dict (in-place): {dict_mod_time:.4f}s")
-    print(f"    HAMT (immutable): {hamt_mod_time:.4f}s")
+    def modify_hamts():
+        for variant in hamt_variants[:10]:
+            for key, value in mod_items:
+                variant = variant.set(key, value)
+    
+    dict_mod_time, dict_mod_median, _ = best_of(run_dict_mods)
+    hamt_mod_time, hamt_mod_median, _ = best_of(lambda: time_ns(modify_hamts))
+    
+    print_timing("  Dict (in-place)", dict_mod_time, dict_mod_median)
+    print_timing("  HAMT (immutable)", hamt_mod_time, hamt_mod_median)
     print(f"    Ratio (HAMT/dict): {hamt_mod_time/dict_mod_time:.2f}x")
+    REPORTER.record('cascading_modifications', 'dict', dict_mod_time, dict_mod_median,
+                    hamt_mod_time, hamt_mod_median)
+
+
+def benchmark_batched_variants(base_size, variant_count):
+    print(f"\nComparing set() against batched construction ({base_size} base items, {variant_count} variants):")
+    
+    start_dict = base_dict(base_size, 'int')
+    start_hamt = base_hamt(base_size, 'int')
+    
+    # Prepare the inputs up front so each side times only HAMT work
+    extra_items = [(f'extra{i}', i) for i in range(variant_count)]
+    merged_dicts = [{**start_dict, key: value} for key, value in extra_items]
+    
+    def set_variants():
+        return [start_hamt.set(key, value) for key, value in extra_items]
+    
+    def batched_variants():
+        return [HAMT(merged) for merged in merged_dicts]
+    
+    set_time, set_median, _ = best_of(lambda: time_ns(set_variants))
+    print_timing("HAMT.set (path copy)", set_time, set_median)
+    
+    batched_time, batched_median, _ = best_of(lambda: time_ns(batched_variants))
+    print_timing("HAMT(dict) (full build)", batched_time, batched_median)
+    print(f"  Ratio (batched/set): {batched_time/set_time:.2f}x")
+    REPORTER.record('batched_variants', 'HAMT.set', set_time, set_median, batched_time, batched_median)
 
 
 def benchmark_hash_collisions_sized(n):
     print(f"\nBenchmarking with hash collisions ({n} items):")
     
-    class BadHash:
-        def __init__(self, value):
-            self.value = value
-        
-        def __hash__(self):
-            return self.value % 10
-        
-        def __eq__(self, other):
-            return isinstance(other, BadHash) and self.value == other.value
+    # Build the keys up front so only collision handling is timed
+    bad = bad_hash_keys(n)
     
-    d = {}
-    start = time.perf_counter()
-    for i in range(n):
-        d[BadHash(i)] = i
-    dict_time = time.perf_counter() - start
-    print(f"  dict with collisions: {dict_time:.4f}s")
+    dict_time, dict_median, _ = best_of(lambda: time_ns(lambda: insert_collisions_dict(bad)))
+    print_timing("dict with collisions", dict_time, dict_median)
     
-    h = HAMT()
-    start = time.perf_counter()
-    for i in range(n):
-        h = h.set(BadHash(i), i)
-    hamt_time = time.perf_counter() - start
-    print(f"  HAMT with collisions: {hamt_time:.4f}s")
+    hamt_time, hamt_median, _ = best_of(lambda: time_ns(lambda: insert_collisions_hamt(bad)))
+    print_timing("HAMT with collisions", hamt_time, hamt_median)
     print(f"  Ratio (HAMT/dict): {hamt_time/dict_time:.2f}x")
+    REPORTER.record('hash_collisions', 'dict', dict_time, dict_median, hamt_time, hamt_median)
+
+
+def benchmark_c_hamt(n, lookups):
+    print(f"\nComparing with immutables.Map (C HAMT) ({n} insertions, {lookups} lookups):")
+    
+    if immutables is None:
+        print("  skipped: install the 'immutables' package to run this comparison")
+        return
+    
+    keys = make_keys(n)
+    
+    def insert(empty):
+        m = empty
+        for i, key in enumerate(keys):
+            m = m.set(key, i)
+        return m
+    
+    c_insert_time, c_insert_median, m = best_of(lambda: time_ns(lambda: insert(immutables.Map())))
+    hamt_insert_time, hamt_insert_median, h = best_of(lambda: time_ns(lambda: insert(HAMT())))
+    
+    sample = random.choices(keys, k=lookups)
+    
+    def lookup(m):
+        for key in sample:
+            _ = m[key]
+    
+    c_lookup_time, c_lookup_median, _ = best_of(lambda: time_ns(lambda: lookup(m)))
+    hamt_lookup_time, hamt_lookup_median, _ = best_of(lambda: time_ns(lambda: lookup(h)))
+    
+    print(f"  Insertions: immutables.Map {format_ns(c_insert_time)}, HAMT {format_ns(hamt_insert_time)}")
+    print(f"    Ratio (HAMT/immutables.Map): {hamt_insert_time/c_insert_time:.2f}x")
+    print(f"  Lookups:    immutables.Map {format_ns(c_lookup_time)}, HAMT {format_ns(hamt_lookup_time)}")
+    print(f"    Ratio (HAMT/immutables.Map): {hamt_lookup_time/c_lookup_time:.2f}x")
+    REPORTER.record('c_hamt_insertions', 'immutables.Map', c_insert_time, c_insert_median,
+                    hamt_insert_time, hamt_insert_median)
+    REPORTER.record('c_hamt_lookups', 'immutables.Map', c_lookup_time, c_lookup_median,
+                    hamt_lookup_time, hamt_lookup_median)
 
 
 # Keep original benchmark_memory_sharing for backward compatibility